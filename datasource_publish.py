@@ -7,6 +7,8 @@ import tableauserverclient as TSC
 from tableauserverclient import ConnectionCredentials
 from tableaudocumentapi import Datasource
 
+from publish_state import PublishState
+
 
 def main():
     parser = argparse.ArgumentParser(description='Publish datasource to server')
@@ -21,6 +23,8 @@ def main():
     parser.add_argument('--username', '-u', required=True, help='username to sign into server')
     parser.add_argument('-p', '--password', required=True, default=None)
     parser.add_argument('--directory', '-d', required=True, default='migrated')
+    parser.add_argument('--state-file', default=None,
+                        help='file with content hashes of earlier publishes, skip datasources that did not change')
 
     parser.add_argument('--logging-level', '-l', choices=['debug', 'info', 'error'], default='warning',
                         help='desired logging level (set to error by default)')
@@ -37,6 +41,7 @@ def main():
     server = TSC.Server(args.server)
 
     overwrite_true = TSC.Server.PublishMode.Overwrite
+    state = PublishState(args.state_file)
 
     with server.auth.sign_in(tableau_auth):
         server.use_server_version()
@@ -70,6 +75,12 @@ def main():
             new_ds_name = "{0}_{1}.{2}".format(filename_short, args.database, file_extension)
             new_ds_name = os.path.join(args.directory, new_ds_name)
             tds.save_as(new_ds_name)
+            state_key = "{0}/{1}/{2}/{3}".format(args.server, args.site or '', project.name, filename_short)
+            # the embedded credentials are not part of the file, a changed login or password must be published
+            parameters = (args.login, args.P)
+            if state.unchanged(state_key, new_ds_name, server.datasources, parameters):
+                print("data source {0} unchanged, publish skipped".format(filename_short))
+                continue
             creds = ConnectionCredentials(args.login, args.P, embed=True)
             new_ds = TSC.DatasourceItem(project.id)
             new_ds.name = filename_short
@@ -78,8 +89,11 @@ def main():
             except TSC.server.endpoint.exceptions.ServerResponseError:
                 server.version = '2.4'
                 new_ds = server.datasources.publish(new_ds, new_ds_name, mode = overwrite_true, connection_credentials=creds)
+            state.published(state_key, new_ds_name, new_ds, parameters)
             print("data source {0} published ID: {1}".format(new_ds.name, new_ds.id))
 
+        state.summary()
+
 
 if __name__ == '__main__':
     main()
@@ -9,15 +9,21 @@
 ####
 
 import argparse
-import codecs
+import copy
 import getpass
 import logging
 import os
 import urllib
 import csv
+import filecmp
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import tableauserverclient as TSC
 
+_RETRY_WAIT = 5
+
 
 def main():
 
@@ -29,6 +35,13 @@ def main():
     parser.add_argument('-p', '--password', default=None)
     parser.add_argument('--filepath', '-f', required=True, help='filepath to save the image(s) returned')
     parser.add_argument('--refresh', '-r', action='store_true', help='refresh the workbook before extracting data')
+    parser.add_argument('--partition-field', '-F', default=None,
+                        help='export views in slices, filtered on this field')
+    parser.add_argument('--partition', '-P', action='append', default=None,
+                        help='value(s) for one slice: a value or a comma separated list of values; an integer range '
+                             'like 2015..2019 gives one slice per value; repeat for every slice')
+    parser.add_argument('--workers', '-w', type=int, default=4, help='number of slices to fetch in parallel')
+    parser.add_argument('--retries', type=int, default=2, help='number of times to retry failed slices')
 
     parser.add_argument('--logging-level', '-l', choices=['debug', 'info', 'error'], default='error',
                         help='desired logging level (set to error by default)')
@@ -37,6 +50,17 @@ def main():
 
     args = parser.parse_args()
 
+    if (args.partition_field is None) != (args.partition is None):
+        parser.error('--partition-field and --partition must be used together')
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.retries < 0:
+        parser.error('--retries can not be negative')
+    try:
+        partitions = parse_partitions(args.partition) if args.partition else None
+    except ValueError as e:
+        parser.error(str(e))
+
     if args.password is None:
         password = getpass.getpass("Password: ")
     else:
@@ -68,25 +92,102 @@ def main():
                         continue
                 for view in wb.views:
                     # Step 3: Query the CSV endpoint and save the data to the specified location
-                    server.views.populate_csv(view)
                     filename = os.path.join(args.filepath, urllib.parse.quote(wb.name, ' '), urllib.parse.quote(view.name, ' ')) + ".csv"
                     try:
                         os.makedirs(os.path.dirname(filename), exist_ok=True)
-                        with open(filename, "w", newline='', encoding='utf-8') as csv_file:
-                            writer = csv.writer(csv_file, delimiter=';')
-                            data = b''
-                            for chunk in view.csv:
-                                data += chunk
-                            data, size = codecs.utf_8_decode(data)
-                            reader = csv.reader(data.splitlines())
-                            writer.writerows(reader)
-                            csv_file.close()
+                        # slices are downloaded next to the output, so large views never have to fit in memory
+                        with tempfile.TemporaryDirectory(dir=os.path.dirname(filename)) as directory:
+                            if partitions is None:
+                                slices = [fetch_csv(server, view, os.path.join(directory, "view.csv"))]
+                            else:
+                                slices = fetch_partitions(server, view, args.partition_field, partitions, directory, args.workers, args.retries)
+                                if len(slices) > 1 and all(filecmp.cmp(slices[0], other, shallow=False) for other in slices[1:]):
+                                    # the filter is ignored when the field is not in the view, every slice is the whole view
+                                    logging.warning("workbook[{0}], view[{1}]: all slices are identical, field [{2}] does not filter this view, "
+                                                    "saving it unpartitioned".format(wb.name, view.name, args.partition_field))
+                                    slices = slices[:1]
+                            with open(filename, "w", newline='', encoding='utf-8') as csv_file:
+                                writer = csv.writer(csv_file, delimiter=';')
+                                merge_partitions(writer, slices)
+                                csv_file.close()
                         logging.info("workbook[{0}], view[{1}]: CSV saved to [{2}]".format(wb.name, view.name, filename))
                     except Exception as e:
                         logging.error("workbook[{0}], view[{1}]: CSV could not be retrieved [{2}]".format(wb.name, view.name, e))
                         write_failed_file(filename)
 
 
+def parse_partitions(partitions):
+    values = list()
+    for partition in partitions:
+        low, sep, high = partition.partition('..')
+        try:
+            value_range = range(int(low), int(high) + 1) if sep else None
+        except ValueError:
+            value_range = None
+        if value_range is None:
+            values.append(partition)
+        elif len(value_range) == 0:
+            raise ValueError("partition [{0}]: range is empty".format(partition))
+        else:
+            # view filters have no range syntax, so a range becomes one slice per value
+            values.extend(str(v) for v in value_range)
+    return values
+
+
+def fetch_csv(server, view, filename, req_options=None):
+    server.views.populate_csv(view, req_options)
+    with open(filename, "wb") as slice_file:
+        for chunk in view.csv:
+            slice_file.write(chunk)
+        slice_file.close()
+    return filename
+
+
+def fetch_partition(server, view, field, value, filename):
+    # populate_csv stores the fetcher on the view item, so every slice needs its own copy
+    view = copy.copy(view)
+    options = TSC.CSVRequestOptions()
+    options.vf(field, value)
+    return fetch_csv(server, view, filename, options)
+
+
+def fetch_partitions(server, view, field, partitions, directory, workers, retries):
+    slices = [os.path.join(directory, "{0}.csv".format(i)) for i in range(len(partitions))]
+    pending = list(range(len(partitions)))
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            # slices mostly fail on server load or timeouts, give the server some time before retrying
+            time.sleep(_RETRY_WAIT * attempt)
+        failed = list()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fetch_partition, server, view, field, partitions[i], slices[i]): i for i in pending}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    future.result()
+                    logging.debug("view[{0}], slice[{1}={2}]: {3} bytes".format(view.name, field, partitions[i], os.path.getsize(slices[i])))
+                except Exception as e:
+                    logging.warning("view[{0}], slice[{1}={2}]: attempt {3} failed [{4}]".format(view.name, field, partitions[i], attempt + 1, e))
+                    failed.append(i)
+        pending = sorted(failed)
+        if not pending:
+            return slices
+    raise RuntimeError("slices failed after {0} attempts: {1}".format(retries + 1, ', '.join(partitions[i] for i in pending)))
+
+
+def merge_partitions(writer, slices):
+    header_written = False
+    for filename in slices:
+        with open(filename, newline='', encoding='utf-8') as slice_file:
+            rows = csv.reader(slice_file)
+            # every slice starts with the same header row, keep only the first one
+            if header_written:
+                next(rows, None)
+            for row in rows:
+                writer.writerow(row)
+                header_written = True
+
+
 def write_failed_file(filename):
     with open(filename + "_FAILED", "w") as failed_file:
         failed_file.write("FAILED")
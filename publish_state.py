@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+import os
+import zipfile
+
+import tableauserverclient as TSC
+
+_CHUNK_SIZE = 1024 * 1024
+_PARAMETER_ITERATIONS = 600000
+
+
+class PublishState:
+    """Content hashes of previously published files, kept in a local JSON file."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = dict()
+        self.hashes = dict()
+        self.skipped_bytes = 0
+        self.uploaded_bytes = 0
+        if filename is not None and os.path.exists(filename):
+            with open(filename, encoding='utf-8') as state_file:
+                self.entries = json.load(state_file)
+
+    def unchanged(self, key, path, endpoint, parameters=()):
+        if self.filename is None:
+            return False
+        entry = self.entries.get(key)
+        if entry is None or entry['hash'] != self.hash(path) \
+                or entry['parameters'] != parameters_hash(parameters, bytes.fromhex(entry['salt'])):
+            return False
+        try:
+            item = endpoint.get_by_id(entry['item_id'])
+        except TSC.ServerResponseError as e:
+            logging.info("{0}: published item can not be retrieved, publishing again [{1}]".format(key, e))
+            return False
+        if str(item.updated_at) != entry['updated_at']:
+            logging.info("{0}: published item was modified on the server, publishing again".format(key))
+            return False
+        size = os.path.getsize(path)
+        self.skipped_bytes += size
+        logging.info("{0}: unchanged since last publish, skipped {1} bytes".format(key, size))
+        return True
+
+    def published(self, key, path, item, parameters=()):
+        size = os.path.getsize(path)
+        self.uploaded_bytes += size
+        logging.info("{0}: uploaded {1} bytes".format(key, size))
+        if self.filename is None:
+            return
+        salt = os.urandom(16)
+        self.entries[key] = {'hash': self.hash(path), 'parameters': parameters_hash(parameters, salt), 'salt': salt.hex(),
+                             'item_id': item.id, 'updated_at': str(item.updated_at)}
+        # write a complete new file first, an interrupted run must not leave a truncated state file behind
+        temporary = self.filename + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as state_file:
+            json.dump(self.entries, state_file, indent=2, sort_keys=True)
+        os.replace(temporary, self.filename)
+
+    def hash(self, path):
+        # hashing a multi-GB extract is expensive, so do it only once per file
+        if path not in self.hashes:
+            self.hashes[path] = content_hash(path)
+        return self.hashes[path]
+
+    def summary(self):
+        print("skipped {0} bytes, uploaded {1} bytes".format(self.skipped_bytes, self.uploaded_bytes))
+
+
+def content_hash(path):
+    sha = hashlib.sha256()
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in sorted(archive.infolist(), key=lambda m: m.filename):
+                if member.is_dir():
+                    continue
+                update_name(sha, member.filename)
+                sha.update(member.file_size.to_bytes(8, 'big'))
+                with archive.open(member) as content:
+                    update_hash(sha, content)
+    else:
+        with open(path, 'rb') as content:
+            update_hash(sha, content)
+    return sha.hexdigest()
+
+
+def parameters_hash(parameters, salt):
+    # parameters can hold passwords, so use a slow salted derivation instead of a plain hash
+    data = b''.join(len(p.encode('utf-8')).to_bytes(8, 'big') + p.encode('utf-8') for p in parameters)
+    return hashlib.pbkdf2_hmac('sha256', data, salt, _PARAMETER_ITERATIONS).hex()
+
+
+def update_name(sha, name):
+    # prefix the length, so the boundary with whatever follows is unambiguous
+    data = name.encode('utf-8')
+    sha.update(len(data).to_bytes(8, 'big'))
+    sha.update(data)
+
+
+def update_hash(sha, content):
+    for chunk in iter(lambda: content.read(_CHUNK_SIZE), b''):
+        sha.update(chunk)
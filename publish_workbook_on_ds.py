@@ -7,6 +7,8 @@ from tableaudocumentapi import Workbook
 
 import tableauserverclient as TSC
 
+from publish_state import PublishState
+
 
 def main():
     parser = argparse.ArgumentParser(description='Connect and publish a workbook to a server.')
@@ -19,6 +21,8 @@ def main():
     parser.add_argument('--source', '-S', default=None)
     parser.add_argument('--target', '-T', default=None)
     parser.add_argument('--directory', '-d', default='migrated')
+    parser.add_argument('--state-file', default=None,
+                        help='file with content hashes of earlier publishes, skip workbooks that did not change')
     parser.add_argument('--logging-level', '-l', choices=['debug', 'info', 'error'], default='error',
                         help='desired logging level (set to error by default)')
 
@@ -35,6 +39,7 @@ def main():
     dest, dest_auth = connect(args.dest, args.U, args.P)
 
     overwrite_true = TSC.Server.PublishMode.Overwrite
+    state = PublishState(args.state_file)
 
     os.makedirs(args.directory, exist_ok=True)
 
@@ -73,13 +78,19 @@ def main():
                     print("{0}, {1} --> {2}".format(ds.caption, ds.name, value))
                 wb_migrated = os.path.join(args.directory, wb)
                 pub.save_as(wb_migrated)
+                state_key = "{0}/{1}/{2}".format(dest.server_address, target.name, os.path.basename(wb))
+                if state.unchanged(state_key, wb_migrated, dest.workbooks):
+                    print("workbook {0} unchanged, publish skipped".format(wb))
+                    continue
                 new_workbook = TSC.WorkbookItem(target.id)
                 try:
                     new_workbook = dest.workbooks.publish(new_workbook, wb_migrated, overwrite_true)
                 except TSC.server.endpoint.exceptions.ServerResponseError:
                     dest.version = '2.4'
                     new_workbook = dest.workbooks.publish(new_workbook, wb_migrated, overwrite_true)
+                state.published(state_key, wb_migrated, new_workbook)
                 print("workbook published ID: {0}".format(new_workbook.id))
+            state.summary()
 
 
 def extract_ds(server, project):
@@ -8,8 +8,11 @@ import time
 import argparse
 import getpass
 import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 import tableauserverclient as TSC
+from tableauserverclient import ServerResponseError
 
 
 def handler(signum, frame):
@@ -25,14 +28,29 @@ def main():
     parser.add_argument('-w', action='store_true', help='wait for the refresh to finish', default=None)
     parser.add_argument('-m', type=int, help='max wait time in seconds', default=0)
     parser.add_argument('-f', type=int, help='check frequency in seconds', default=5)
+    parser.add_argument('--project', '-P', default=None, help='only refresh workbooks in this project')
+    parser.add_argument('--file', '-F', default=None, help='file with workbooks to refresh, one name per line')
+    parser.add_argument('--batch-size', type=int, default=50, help='number of workbook names to look up per request')
+    parser.add_argument('--workers', type=int, default=4, help='number of lookups to run in parallel')
 
     parser.add_argument('--logging-level', '-l', choices=['debug', 'info', 'error'], default='error',
                         help='desired logging level (set to error by default)')
 
-    parser.add_argument('workbook', help='one or more workbooks to refresh', nargs='+')
+    parser.add_argument('workbook', help='one or more workbooks to refresh', nargs='*')
 
     args = parser.parse_args()
 
+    names = list(args.workbook)
+    if args.file is not None:
+        with open(args.file, encoding='utf-8') as names_file:
+            names.extend(line.strip() for line in names_file if line.strip())
+    if not names:
+        parser.error('no workbooks to refresh, name them on the command line or use --file')
+    if args.batch_size < 1:
+        parser.error('--batch-size must be at least 1')
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+
     if args.p is None:
         password = getpass.getpass("Password: ")
     else:
@@ -51,19 +69,23 @@ def main():
     signal.signal(signal.SIGALRM, handler)
 
     tableau_auth = TSC.TableauAuth(args.username, password, args.site)
-    server = TSC.Server(args.server)
+    #use api version corresponding with server version
+    server = TSC.Server(args.server, use_server_version=True)
     server.add_http_options(options)
-    server.version = "2.8"
 
     jobs = dict()
 
     with server.auth.sign_in(tableau_auth):
-        workbooks, pagination_item = server.workbooks.get()
+        workbooks = find_workbooks(server, names, args.project, args.batch_size, args.workers)
+        missing = set(names) - set(wb.name for wb in workbooks)
+        if missing:
+            logging.error("workbooks not found: {0}".format(', '.join(sorted(missing))))
         for wb in workbooks:
-            logging.debug(wb.name)
-            if wb.name in args.workbook:
-                logging.info("{0}: {1}".format(wb.name, wb.id))
+            logging.info("{0}: {1} ({2})".format(wb.name, wb.id, wb.project_name))
+            try:
                 jobs[wb.id] = (wb, server.workbooks.refresh(wb.id))
+            except ServerResponseError as e:
+                logging.error("exception while processing [{1}]: {0}".format(str(e), wb.name))
         if args.w:
             signal.alarm(args.m)
             n = 0
@@ -82,5 +104,35 @@ def main():
             signal.alarm(0)
 
 
+def find_workbooks(server, names, project, batch_size, workers):
+    names = set(names)
+    # TSC does not escape filter values, so only names made of safe characters can be filtered on
+    plain = sorted(name for name in names if re.fullmatch(r'[\w .()-]+', name))
+    batches = [plain[i:i + batch_size] for i in range(0, len(plain), batch_size)]
+    workbooks = dict()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for found in executor.map(lambda batch: lookup_workbooks(server, batch, project), batches):
+            for wb in found:
+                if wb.name in names:
+                    workbooks[wb.id] = wb
+    # the other names, and any name the filter did not match, are looked up in one scan of the project
+    if names - set(wb.name for wb in workbooks.values()):
+        for wb in lookup_workbooks(server, None, project):
+            if wb.name in names:
+                workbooks[wb.id] = wb
+    return list(workbooks.values())
+
+
+def lookup_workbooks(server, names, project):
+    options = TSC.RequestOptions(pagesize=1000)
+    if names is not None:
+        options.filter.add(TSC.Filter(TSC.RequestOptions.Field.Name, TSC.RequestOptions.Operator.In, names))
+    if project is not None:
+        options.filter.add(TSC.Filter(TSC.RequestOptions.Field.ProjectName, TSC.RequestOptions.Operator.Equals, project))
+    workbooks = list(TSC.Pager(server.workbooks, options))
+    logging.debug("lookup of {0} names returned {1} workbooks".format(len(names) if names else 'all', len(workbooks)))
+    return workbooks
+
+
 if __name__ == '__main__':
     main()